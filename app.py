@@ -1,114 +1,207 @@
+# Must run before anything else imports socket/ssl so that requests made
+# under the gevent worker cooperatively yield instead of blocking
+from gevent import monkey
+monkey.patch_all()
+
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from flask_cors import CORS
-import pandas as pd
-from io import StringIO
+import csv
+import logging
 import os
+import threading
+import time
+
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'))
+logger = logging.getLogger(__name__)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson's native encoder"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
-def get_navs_from_csv(tickers):
-    """Fetch NAV for any tickers from Roundhill CSV file"""
-    csv_url = "https://www.roundhillinvestments.com/assets/data/FilepointRoundhill.40RU.RU_DailyNAV.csv"
-    
-    headers = {
-        "Host": "www.roundhillinvestments.com",
-        "Sec-Ch-Ua": '"Chromium";v="141", "Not?A_Brand";v="8"',
-        "Sec-Ch-Ua-Mobile": "?0",
-        "Sec-Ch-Ua-Platform": '"Windows"',
-        "Accept-Language": "en-US,en;q=0.9",
-        "Upgrade-Insecure-Requests": "1",
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36",
-        "Accept": "text/csv,text/plain,*/*",
-        "Sec-Fetch-Site": "same-origin",
-        "Sec-Fetch-Mode": "cors",
-        "Sec-Fetch-Dest": "empty",
-        "Referer": "https://www.roundhillinvestments.com/",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive"
-    }
-    
-    try:
-        print(f"📡 Fetching NAV CSV from: {csv_url}")
-        
-        response = requests.get(csv_url, headers=headers, verify=False, timeout=15)
-        
-        if response.status_code != 200:
-            print(f"❌ HTTP {response.status_code}")
-            return {ticker: None for ticker in tickers}
-        
-        print(f"✅ CSV downloaded successfully ({len(response.text)} bytes)")
-        
-        # Parse CSV
-        csv_data = StringIO(response.text)
-        df = pd.read_csv(csv_data)
-        
-        print(f"📊 CSV has {len(df)} rows")
-        
-        # Get list of all available tickers in the CSV
-        available_tickers = df['Fund Ticker'].str.upper().unique().tolist()
-        print(f"📋 Available tickers in CSV: {', '.join(available_tickers)}")
-        
-        nav_data = {}
-        
-        for ticker in tickers:
-            ticker_upper = ticker.upper()
-            
-            # Find the row where 'Fund Ticker' matches our ticker
-            matching_rows = df[df['Fund Ticker'].str.upper() == ticker_upper]
-            
-            if not matching_rows.empty:
-                # Get the NAV value from the first matching row
-                nav_value = matching_rows['NAV'].iloc[0]
-                
-                # Handle potential string values and convert to float
-                if pd.notna(nav_value):
+# The health payload never changes, so serialize it once at import time
+# instead of running jsonify for every Railway probe. Only the body is
+# shared; a Response is built per hit because flask-cors mutates
+# response headers in place
+_HEALTH_BODY = orjson.dumps({'status': 'healthy'})
+
+# Static part of the home payload; only available_tickers varies per hit
+_HOME_PAYLOAD = {
+    'status': 'online',
+    'service': 'NAV Scraper API',
+    'version': '3.0.0',
+    'method': 'CSV',
+    'note': 'Enter any ticker to check if NAV data is available'
+}
+
+CSV_URL = "https://www.roundhillinvestments.com/assets/data/FilepointRoundhill.40RU.RU_DailyNAV.csv"
+
+# NAV updates at most once a day, so cache the parsed CSV for a few minutes
+# instead of re-downloading it on every request
+NAV_CACHE_TTL = int(os.environ.get('NAV_CACHE_TTL', 300))
+
+_CACHE = {
+    'expires': 0.0,
+    'nav_by_ticker': {},
+    'available': [],
+    'etag': None,
+    'last_modified': None
+}
+_CACHE_LOCK = threading.Lock()
+
+# Shared session so repeated fetches reuse the same keep-alive TLS connection
+# instead of paying a TCP + TLS handshake per request
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=1.0,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=('GET',)
+    )
+))
+SESSION.headers.update({
+    "Host": "www.roundhillinvestments.com",
+    "Sec-Ch-Ua": '"Chromium";v="141", "Not?A_Brand";v="8"',
+    "Sec-Ch-Ua-Mobile": "?0",
+    "Sec-Ch-Ua-Platform": '"Windows"',
+    "Accept-Language": "en-US,en;q=0.9",
+    "Upgrade-Insecure-Requests": "1",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36",
+    "Accept": "text/csv,text/plain,*/*",
+    "Sec-Fetch-Site": "same-origin",
+    "Sec-Fetch-Mode": "cors",
+    "Sec-Fetch-Dest": "empty",
+    "Referer": "https://www.roundhillinvestments.com/",
+    "Accept-Encoding": "gzip, deflate, br"
+})
+# Verify against certifi's bundle by default; deployments behind a
+# corporate proxy can point CA_BUNDLE at their own CA file
+SESSION.verify = os.environ.get('CA_BUNDLE') or True
+
+def _load_nav_table():
+    """Fetch and parse the Roundhill NAV CSV, caching the result for NAV_CACHE_TTL seconds
+
+    Returns a (nav_by_ticker, available_tickers) tuple where nav_by_ticker maps
+    upper-cased tickers to float NAVs (or None).
+    """
+    # Fast path: a fresh cache is served without taking the lock, so
+    # repeated requests cost two dict reads. The table is replaced
+    # wholesale (never mutated in place), which makes this safe
+    if time.monotonic() < _CACHE['expires']:
+        return _CACHE['nav_by_ticker'], _CACHE['available']
+
+    with _CACHE_LOCK:
+        # Re-check under the lock in case another worker just refreshed
+        if time.monotonic() < _CACHE['expires']:
+            return _CACHE['nav_by_ticker'], _CACHE['available']
+
+        try:
+            logger.info("Fetching NAV CSV from: %s", CSV_URL)
+
+            # Revalidate with a conditional GET so an unchanged CSV comes
+            # back as an empty 304 instead of the full body
+            conditional_headers = {}
+            if _CACHE['etag']:
+                conditional_headers['If-None-Match'] = _CACHE['etag']
+            if _CACHE['last_modified']:
+                conditional_headers['If-Modified-Since'] = _CACHE['last_modified']
+
+            with SESSION.get(CSV_URL, headers=conditional_headers, timeout=15,
+                             stream=True) as response:
+                if response.status_code == 304:
+                    logger.debug("CSV unchanged upstream (304), reusing cached table")
+                    _CACHE['expires'] = time.monotonic() + NAV_CACHE_TTL
+                    return _CACHE['nav_by_ticker'], _CACHE['available']
+
+                if response.status_code != 200:
+                    logger.warning("CSV fetch failed: HTTP %s", response.status_code)
+                    return {}, []
+
+                # The CSV is only a handful of rows, so the stdlib csv module
+                # covers it without pulling in pandas. Stream the decompressed
+                # body line by line straight into the reader so it is never
+                # materialized as a full bytes/str blob first
+                response.encoding = 'utf-8'
+                reader = csv.DictReader(response.iter_lines(decode_unicode=True))
+
+                nav_by_ticker = {}
+
+                for row in reader:
+                    ticker_upper = row['Fund Ticker'].upper()
+                    # Keep the first row if a ticker ever appears twice, matching
+                    # the old first-matching-row lookup
+                    if ticker_upper in nav_by_ticker:
+                        continue
                     try:
-                        nav_float = float(nav_value)
-                        nav_data[ticker_upper] = nav_float
-                        print(f"✅ {ticker_upper}: ${nav_float:.2f}")
-                    except (ValueError, TypeError):
-                        nav_data[ticker_upper] = None
-                        print(f"❌ {ticker_upper}: Invalid NAV value '{nav_value}'")
-                else:
-                    nav_data[ticker_upper] = None
-                    print(f"❌ {ticker_upper}: NAV is null")
-            else:
-                nav_data[ticker_upper] = None
-                print(f"❌ {ticker_upper}: Not found in CSV")
-        
-        return nav_data, available_tickers
-        
-    except Exception as e:
-        print(f"❌ Error fetching CSV: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return {ticker: None for ticker in tickers}, []
+                        nav_by_ticker[ticker_upper] = float(row['NAV'])
+                    except (TypeError, ValueError):
+                        nav_by_ticker[ticker_upper] = None
+
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+
+            # Get list of all available tickers in the CSV
+            available_tickers = list(nav_by_ticker)
+            logger.info("CSV has %d rows; available tickers: %s",
+                        len(nav_by_ticker), ', '.join(available_tickers))
+
+            _CACHE['nav_by_ticker'] = nav_by_ticker
+            _CACHE['available'] = available_tickers
+            _CACHE['etag'] = etag
+            _CACHE['last_modified'] = last_modified
+            _CACHE['expires'] = time.monotonic() + NAV_CACHE_TTL
+
+            return nav_by_ticker, available_tickers
+
+        except Exception:
+            logger.exception("Error fetching CSV")
+            return {}, []
+
+def get_navs_from_csv(tickers):
+    """Fetch NAV for any tickers from the cached Roundhill CSV table"""
+    nav_by_ticker, available_tickers = _load_nav_table()
+
+    upper_tickers = [ticker.upper() for ticker in tickers]
+    nav_data = {ticker: nav_by_ticker.get(ticker) for ticker in upper_tickers}
+
+    return nav_data, available_tickers
 
 @app.route('/', methods=['GET'])
 def home():
     """Health check endpoint"""
-    # Get available tickers dynamically
-    try:
-        _, available_tickers = get_navs_from_csv([])
-        supported_tickers = available_tickers if available_tickers else []
-    except:
-        supported_tickers = []
-    
-    return jsonify({
-        'status': 'online',
-        'service': 'NAV Scraper API',
-        'version': '3.0.0',
-        'method': 'CSV',
-        'note': 'Enter any ticker to check if NAV data is available',
-        'available_tickers': supported_tickers if supported_tickers else 'Could not fetch at this time'
-    })
+    # Serve whatever the cache currently holds; a cold or stale cache is
+    # warmed in the background so this endpoint never blocks on the
+    # upstream fetch (uptime monitors may poll / frequently)
+    if time.monotonic() >= _CACHE['expires']:
+        threading.Thread(target=_load_nav_table, daemon=True).start()
+
+    supported_tickers = _CACHE['available']
+
+    return jsonify(dict(
+        _HOME_PAYLOAD,
+        available_tickers=supported_tickers if supported_tickers else 'Could not fetch at this time'
+    ))
 
 @app.route('/health', methods=['GET'])
 def health():
     """Additional health check endpoint for Railway"""
-    return jsonify({'status': 'healthy'}), 200
+    return app.response_class(_HEALTH_BODY, mimetype='application/json')
 
 @app.route('/get-nav', methods=['POST'])
 def get_nav():
@@ -128,7 +221,7 @@ def get_nav():
         # Format 1: Array of tickers {"tickers": ["TSLW", "HOOW"]}
         if 'tickers' in data:
             if isinstance(data['tickers'], list):
-                tickers = data['tickers']
+                tickers = [t.strip().upper() for t in data['tickers'] if t.strip()]
             # Format 2: Comma-separated string {"tickers": "TSLW,HOOW,MSTY"}
             elif isinstance(data['tickers'], str):
                 tickers = [t.strip().upper() for t in data['tickers'].split(',') if t.strip()]
@@ -165,22 +258,20 @@ def get_nav():
                 'message': 'No tickers provided'
             }), 400
         
-        print(f"\n=== NAV DATA FETCHING START ===")
-        print(f"Requested tickers: {tickers}")
-        
+        logger.info("Requested tickers: %s", tickers)
+
         # Fetch NAV data for ALL requested tickers (no filtering)
         nav_data, available_tickers = get_navs_from_csv(tickers)
-        
-        print(f"\n=== NAV DATA FETCHING COMPLETE ===")
-        print(f"Results: {nav_data}")
+
+        logger.info("NAV results: %s", nav_data)
         
         # Build response
         response_data = {
             'navData': nav_data
         }
         
-        # Check if any tickers were not found
-        not_found = [t.upper() for t in tickers if nav_data.get(t.upper()) is None]
+        # Check if any tickers were not found (tickers are already upper-cased)
+        not_found = [t for t in tickers if nav_data.get(t) is None]
         
         if not_found:
             response_data['message'] = f"Some tickers not found: {', '.join(not_found)}"
@@ -189,9 +280,7 @@ def get_nav():
         return jsonify(response_data)
         
     except Exception as e:
-        print(f"❌ Error in get-nav endpoint: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in get-nav endpoint")
         return jsonify({
             'error': 'Internal server error',
             'details': str(e)
@@ -199,5 +288,5 @@ def get_nav():
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
-    print(f"🚀 Starting Flask server on 0.0.0.0:{port}")
+    logger.info("Starting Flask server on 0.0.0.0:%d", port)
     app.run(host='0.0.0.0', port=port, debug=False)